@@ -1,28 +1,166 @@
-from concurrent.futures import thread
 import re
-import sys
 import socket
+import struct
 import logging
+import functools
 import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_NEWLINE_RE = re.compile(r'\r\n?|\n')
+_HEADER_RE = re.compile(r'@header=\s*\{\s*(.*?)\s*\};')
+_DATA_RE = re.compile(r'@data=\s*\{\s*(.*?)\s*\};')
+_HEADER_FIELD_RE = re.compile(r'\[(\w+),(.*?)\];')
+_HEADER_FIELDS = { '1':'_target_id', '2':'_target_sub_id', '3':'_source_id', '4':'_source_sub_id',
+                   '5':'_message_type', '6':'_version' }
+
+BINARY_VERSION = "2.0.0.0"
+_PACKET_MODE = 2
+_SENDMSG_MAX_BUFFERS = 1024
+_RECV_CHUNK_SIZE = 65536
+_SCAN_CACHE_MAX_LENGTH = 4096
+_BINARY_MAGIC = b'@bin'
+_UINT8_STRUCT = struct.Struct('<B')
+_UINT16_STRUCT = struct.Struct('<H')
+_UINT32_STRUCT = struct.Struct('<I')
+_FRAME_FIELDS_STRUCT = struct.Struct('<BI')
+
+logger = logging.getLogger(__name__)
+
+def _index_by_name(values):
+    index = {}
+    
+    for current in values:
+        if not current:
+            continue
+        
+        index.setdefault(current.name_string, []).append(current)
+        
+    return index
+
+def _serialize_values(parts, values):
+    pending = values[::-1]
+    while pending:
+        current = pending.pop()
+        if not current:
+            continue
+        
+        replaced_value = current.value_string.replace("\r", "</0x0A;>").\
+            replace("\n", "</0x0B;>").replace(" ", "</0x0C;>").replace("\t", "</0x0D;>")
+        parts.append(f"[{current.name_string},{current.type_string},{replaced_value}];")
+        
+        if current.values:
+            pending.extend(reversed(current.values))
+
+def _scan_values(data_string):
+    results = []
+    
+    for item in data_string.split('];'):
+        start = item.find('[')
+        if start < 0:
+            continue
+        
+        fields = item[start + 1:].split(',', 2)
+        if len(fields) < 3:
+            continue
+        
+        results.append((fields[0], fields[1].lstrip(), fields[2].lstrip()))
+        
+    return results
+
+@functools.lru_cache(maxsize=256)
+def _scan_values_cached(data_string):
+    return tuple(_scan_values(data_string))
+
+def _write_binary_string(buffer, length_struct, text):
+    encoded = text.encode('utf-8')
+    buffer += length_struct.pack(len(encoded))
+    buffer += encoded
+
+def _write_binary_values(buffer, values):
+    values = [current for current in values if current]
+    buffer += _UINT32_STRUCT.pack(len(values))
+    
+    pending = values[::-1]
+    while pending:
+        current = pending.pop()
+        _write_binary_string(buffer, _UINT8_STRUCT, current.type_string)
+        _write_binary_string(buffer, _UINT16_STRUCT, current.name_string)
+        _write_binary_string(buffer, _UINT32_STRUCT, current.value_string)
+        
+        children = [child for child in current.values if child]
+        buffer += _UINT32_STRUCT.pack(len(children))
+        pending.extend(reversed(children))
+
+def _check_binary_bounds(view, end):
+    if end > len(view):
+        raise ValueError("truncated binary container")
+
+def _read_binary_string(view, offset, length_struct):
+    _check_binary_bounds(view, offset + length_struct.size)
+    (length,) = length_struct.unpack_from(view, offset)
+    offset += length_struct.size
+    
+    _check_binary_bounds(view, offset + length)
+    return str(view[offset:offset + length], 'utf-8'), offset + length
+
+def _read_binary_count(view, offset):
+    _check_binary_bounds(view, offset + _UINT32_STRUCT.size)
+    (count,) = _UINT32_STRUCT.unpack_from(view, offset)
+    
+    return count, offset + _UINT32_STRUCT.size
+
+def _read_binary_values(view, offset, parent):
+    count, offset = _read_binary_count(view, offset)
+    open_values = [[parent, count]]
+    
+    while open_values:
+        current = open_values[-1]
+        if current[1] == 0:
+            open_values.pop()
+            continue
+        current[1] -= 1
+        
+        type_string, offset = _read_binary_string(view, offset, _UINT8_STRUCT)
+        name_string, offset = _read_binary_string(view, offset, _UINT16_STRUCT)
+        value_string, offset = _read_binary_string(view, offset, _UINT32_STRUCT)
+        
+        child_value = value(name_string, type_string, '')
+        child_value.value_string = value_string
+        current[0].append(child_value)
+        
+        count, offset = _read_binary_count(view, offset)
+        open_values.append([child_value, count])
+        
+    return offset
 
 class value:
     
-    parent = None
-    name_string = None
-    type_string = None
-    value_string = None
-    values = []
+    __slots__ = ('parent', 'name_string', 'type_string', 'value_string', 'values',
+                 '_values_by_name', '_expected_count')
         
-    def __init__(self, name_string, type_string, value_string, values = []):
+    def __init__(self, name_string, type_string, value_string, values = None):
+        self.parent = None
         self.name_string = name_string
         self.type_string = type_string
-        self.value_string = value_string.replace("</0x0A;>", "\r").\
-            replace("</0x0B;>", "\n").replace("</0x0C;>", " ").replace("</0x0D;>", "\t")
-        self.values = values
+        if "</0x0" in value_string:
+            value_string = value_string.replace("</0x0A;>", "\r").\
+                replace("</0x0B;>", "\n").replace("</0x0C;>", " ").replace("</0x0D;>", "\t")
+        self.value_string = value_string
+        self.values = [] if values is None else list(values)
+        self._values_by_name = None
+        self._expected_count = -1
+        
+        if type_string == 'e':
+            try:
+                self._expected_count = int(self.value_string)
+            except ValueError:
+                self._expected_count = -1
   
     def append(self, child_value):
         child_value.parent = self
         self.values.append(child_value)
+        if self._values_by_name is not None:
+            self._values_by_name.setdefault(child_value.name_string, []).append(child_value)
         
     def remove(self, name_string):
         result = []
@@ -37,69 +175,73 @@ class value:
             result.append(current)
             
         self.values = result
+        self._values_by_name = None
         
     def get(self, name_string):
         if not name_string:
+            self._values_by_name = None
             return self.values
         
-        result = []
-        
-        for current in self.values:
-            if not current:
-                continue
-            
-            if current.name_string != name_string:
-                continue
+        if self._values_by_name is None:
+            self._values_by_name = _index_by_name(self.values)
             
-            result.append(current)
-            
-        return result
+        return list(self._values_by_name.get(name_string, []))
     
     def serialize(self):
-        replaced_value = self.value_string.replace("\r", "</0x0A;>").\
-            replace("\n", "</0x0B;>").replace(" ", "</0x0C;>").replace("\t", "</0x0D;>")
-        result = "[{},{},{}];".format(self.name_string, self.type_string, replaced_value)
+        parts = []
+        _serialize_values(parts, [self])
         
-        for current in self.values:
-            if not current:
-                continue
-            
-            result = result + current.serialize()
-            
-        return result
-
+        return ''.join(parts)
+    
 class container:
     
-    headers = {}
-    values = []
+    __slots__ = ('_target_id', '_target_sub_id', '_source_id', '_source_sub_id', '_message_type', '_version',
+                 'values', 'data_string', 'deserialized',
+                 '_values_by_name', '_serialized', '_serialized_bytes')
         
     def __init__(self, message = ''):
-        self.headers = { '1':"", '2':"", '3':"", '4':"", '5':"", '6':"1.0.0.0" }
+        self._target_id = ''
+        self._target_sub_id = ''
+        self._source_id = ''
+        self._source_sub_id = ''
+        self._message_type = ''
+        self._version = "1.0.0.0"
         self.values = []
+        self._values_by_name = None
+        self._serialized = None
+        self._serialized_bytes = None
         self.parse(message, False)
         
-    def create(self, target_id = '', target_sub_id = '', source_id = '', source_sub_id = '', message_type = '', values = []):
-        self.headers['1'] = target_id
-        self.headers['2'] = target_sub_id
-        self.headers['3'] = source_id
-        self.headers['4'] = source_sub_id
-        self.headers['5'] = message_type
-        self.headers['6'] = "1.0.0.0"
+    def create(self, target_id = '', target_sub_id = '', source_id = '', source_sub_id = '', message_type = '', values = None):
+        self._target_id = target_id
+        self._target_sub_id = target_sub_id
+        self._source_id = source_id
+        self._source_sub_id = source_sub_id
+        self._message_type = message_type
+        self._version = "1.0.0.0"
         self.data_string = ''
-        self.values = values
+        self.values = [] if values is None else list(values)
+        self._values_by_name = None
         self.deserialized = True
+        self._clear_serialized()
         
     def parse(self, message, parsing):
         self.data_string = message
         self.deserialized = parsing
+        self._clear_serialized()
         
         if message == '':
             return
         
-        message = re.sub(r'\r\n?|\n', '', message)
+        if '\n' in message or '\r' in message:
+            message = _NEWLINE_RE.sub('', message)
+        
+        header = _HEADER_RE.search(message)
+        if header:
+            self._parse_header(header.group(1))
         
-        self._parse_header(re.search(r'@header=[\s?]*\{[\s?]*(.*?)[\s?]*\};', message).group())
-        self._parse_data(re.search(r'@data=[\s?]*\{[\s?]*(.*?)[\s?]*\};', message).group(), parsing)
+        data = _DATA_RE.search(message)
+        self._parse_data(data.group() if data else "@data={};", parsing)
 
     def append(self, child_value):
         if child_value.type_string == '0':
@@ -108,86 +250,133 @@ class container:
         self.deserialized = True
         child_value.parent = None
         self.values.append(child_value)
+        if self._values_by_name is not None:
+            self._values_by_name.setdefault(child_value.name_string, []).append(child_value)
+        self._clear_serialized()
         
     def get(self, name_string):
         if not self.deserialized:
             self._parse_data(self.data_string, True)
+        
+        self._clear_serialized()
             
         if not name_string:
+            self._values_by_name = None
             return self.values
         
-        result = []
+        if self._values_by_name is None:
+            self._values_by_name = _index_by_name(self.values)
         
-        for current in self.values:
-            if not current:
-                continue
-            
-            if current.name_string != name_string:
-                continue
-            
-            result.append(current)
+        result = self._values_by_name.get(name_string)
+        if not result:
+            return [value(name_string, '0', '')]
             
-        if len(result) == 0:
-            result.append(value(name_string, '0', ''))
-            
-        return result
+        return list(result)
         
     def serialize(self):
+        if self._serialized is not None:
+            return self._serialized
+        
         if self.deserialized:
             self.data_string = self._make_string()
             self.deserialized = False
         
-        result = "{}[1,{}];[2,{}];[3,{}];[4,{}];[5,{}];[6,{}];{}{}".format(
-            "@header={", self.headers['1'], self.headers['2'], self.headers['3'], self.headers['4'],
-            self.headers['5'], self.headers['6'], "};", self.data_string)
+        self._serialized = (f"@header={{[1,{self._target_id}];[2,{self._target_sub_id}];[3,{self._source_id}];"
+                            f"[4,{self._source_sub_id}];[5,{self._message_type}];[6,{self._version}];}};"
+                            f"{self.data_string}")
+        
+        return self._serialized
+    
+    def serialize_bytes(self):
+        if self._serialized_bytes is None:
+            self._serialized_bytes = self.serialize().encode('utf-8')
+        
+        return self._serialized_bytes
+    
+    def serialize_binary(self):
+        values = self.get('')
         
-        return result
+        buffer = bytearray(_BINARY_MAGIC)
+        for header in (self._target_id, self._target_sub_id, self._source_id, self._source_sub_id,
+                       self._message_type, self._version):
+            _write_binary_string(buffer, _UINT16_STRUCT, header)
+        _write_binary_values(buffer, values)
+        
+        return bytes(buffer)
+    
+    def parse_binary(self, message):
+        view = memoryview(message)
+        if view[:len(_BINARY_MAGIC)] != _BINARY_MAGIC:
+            raise ValueError("message is not in binary container format")
+        
+        offset = len(_BINARY_MAGIC)
+        for field in _HEADER_FIELDS.values():
+            header, offset = _read_binary_string(view, offset, _UINT16_STRUCT)
+            setattr(self, field, header)
+        
+        self.data_string = ''
+        self.values = []
+        self._values_by_name = None
+        _read_binary_values(view, offset, self)
+        self.deserialized = True
+        self._clear_serialized()
     
     def target_id(self):
-        return self.headers['1']
+        return self._target_id
     
     def target_sub_id(self):
-        return self.headers['2']
+        return self._target_sub_id
     
     def source_id(self):
-        return self.headers['3']
+        return self._source_id
     
     def source_sub_id(self):
-        return self.headers['4']
+        return self._source_sub_id
     
     def message_type(self):
-        return self.headers['5']
+        return self._message_type
     
     def version(self):
-        return self.headers['6']
+        return self._version
     
     def set_target_id(self, value_string):
-        self.headers['1'] = value_string
+        self._target_id = value_string
+        self._clear_serialized()
     
     def set_target_sub_id(self, value_string):
-        self.headers['2'] = value_string
+        self._target_sub_id = value_string
+        self._clear_serialized()
     
     def set_source_id(self, value_string):
-        self.headers['3'] = value_string
+        self._source_id = value_string
+        self._clear_serialized()
     
     def set_source_sub_id(self, value_string):
-        self.headers['4'] = value_string
+        self._source_sub_id = value_string
+        self._clear_serialized()
     
     def set_message_type(self, value_string):
-        self.headers['5'] = value_string
+        self._message_type = value_string
+        self._clear_serialized()
+    
+    def set_version(self, value_string):
+        self._version = value_string
+        self._clear_serialized()
         
     def _parse_header(self, header_string):
         if not header_string:
             return
         
-        results = re.findall(r'\[(\w+),(.*?)\];', header_string)
+        results = _HEADER_FIELD_RE.findall(header_string)
         for result in results:
             type_string, data_string = result
             
-            try:
-                self.headers[type_string] = data_string
-            except:
-                logging.error("cannot parse header with unknown type: {}".format(type_string))
+            field = _HEADER_FIELDS.get(type_string)
+            if field is None:
+                logger.error("cannot parse header with unknown type: %s", type_string)
+                continue
+            
+            setattr(self, field, data_string)
     
     def _parse_data(self, data_string, parsing):
         self.data_string = data_string
@@ -195,60 +384,80 @@ class container:
         if not parsing:
             return
         
-        value_list = []
-        results = re.findall(r'\[(\w+),[\s?]*(\w+),[\s?]*(.*?)\];', data_string)
-        for result in results:
-            name_string, type_string, value_string = result
-            value_list.append(value(name_string, type_string, value_string))
+        self.values = []
+        self._values_by_name = None
+        if len(data_string) <= _SCAN_CACHE_MAX_LENGTH:
+            results = _scan_values_cached(data_string)
+        else:
+            results = _scan_values(data_string)
+        value_list = [value(name_string, type_string, value_string)
+                      for name_string, type_string, value_string in results]
             
-        previous_value = None
+        append_root = self.values.append
+        open_values = []
         for current_value in value_list:
             if current_value.type_string == '0':
                 continue
                 
-            if not previous_value:
-                self.append(current_value)
-                if current_value.type_string == 'e':
-                    previous_value = current_value
-                continue
-
-            previous_value.append(current_value)
-            if current_value.type_string == 'e':
-                previous_value = current_value
+            if open_values:
+                open_values[-1].append(current_value)
+            else:
+                append_root(current_value)
+                
+            if current_value._expected_count > 0:
+                open_values.append(current_value)
                 continue
 
-            if "{}".format(len(previous_value.values)) == previous_value.value_string:
-                previous_value = previous_value.parent
+            while open_values and len(open_values[-1].values) == open_values[-1]._expected_count:
+                open_values.pop()
+    
+    def _clear_serialized(self):
+        self._serialized = None
+        self._serialized_bytes = None
     
     def _make_string(self):
-        result = "@data={"
+        parts = ["@data={"]
         
-        for current in self.values:
-            result = result + current.serialize()
-            
-        result = result + "};"
+        _serialize_values(parts, self.values)
+        parts.append("};")
             
-        return result
+        return ''.join(parts)
 
 class messaging_client:
         
-    def __init__(self, source_id, connection_key, start_number = 231, end_number = 67, conn_callback = None, recv_callback = None):
+    def __init__(self, source_id, connection_key, start_number = 231, end_number = 67, conn_callback = None, recv_callback = None,
+                 no_delay = True, send_buffer_size = None, recv_buffer_size = None):
         self.source_id = source_id
         self.source_sub_id = ''
         self.connection_key = connection_key
         self.start_code = bytes([start_number, start_number, start_number, start_number])
         self.end_code = bytes([end_number, end_number, end_number, end_number])
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._frame_prefix = self.start_code + bytes([_PACKET_MODE])
+        self.no_delay = no_delay
+        self.send_buffer_size = send_buffer_size
+        self.recv_buffer_size = recv_buffer_size
+        self.sock = None
         self.conn_callback = conn_callback
         self.recv_callback = recv_callback
+        self.recv_thread = None
+        self.recv_task = None
+        self._callback_executor = None
+        self._recv_buffer = bytearray()
+        self._recv_chunk = memoryview(bytearray(_RECV_CHUNK_SIZE))
         
     def start(self, server_ip, server_port, auto_echo = False, auto_echo_interval_seconds = 1):
         server_address = (server_ip, server_port)
 
+        self.sock = self._create_socket()
+        self._recv_buffer.clear()
         try:
             self.sock.connect(server_address)
-        except:
+        except OSError:
+            self.sock.close()
+            self.sock = None
             return False
+        
+        self._callback_executor = ThreadPoolExecutor(max_workers=1)
               
         self.recv_thread = threading.Thread(target=self.recv)
         self.recv_thread.daemon = True
@@ -257,100 +466,307 @@ class messaging_client:
         self._send_connection(auto_echo, auto_echo_interval_seconds)
         
         return True
+    
+    async def start_async(self, server_ip, server_port, auto_echo = False, auto_echo_interval_seconds = 1):
+        import asyncio
         
-    def stop(self):
-        if self.sock is not None:
-            self.sock.shutdown(socket.SHUT_WR)
+        loop = asyncio.get_running_loop()
+        server_address = (server_ip, server_port)
+        
+        self.sock = self._create_socket()
+        self._recv_buffer.clear()
+        self._callback_executor = None
+        self.sock.setblocking(False)
+        try:
+            await loop.sock_connect(self.sock, server_address)
+        except OSError:
+            self.sock.close()
             self.sock = None
+            return False
         
-    def send_packet(self, packet):
-        if not packet.target_id:
-            logging.error("cannot send with null target id")
+        self.recv_task = loop.create_task(self.recv_async())
+        
+        await self.send_packet_async(self._connection_packet(auto_echo, auto_echo_interval_seconds))
+        
+        return True
+        
+    def stop(self):
+        sock = self.sock
+        if sock is None:
             return
+        
+        self.sock = None
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        
+        if self.recv_thread is not None and self.recv_thread is not threading.current_thread():
+            self.recv_thread.join()
             
-        if packet.source_id() == '':
-            packet.set_source_id(self.source_id)
-            packet.set_source_sub_id(self.source_sub_id)
-                    
-        data_array = bytes(packet.serialize(), 'utf-8')
-        len_data = len(data_array).to_bytes(4, byteorder='little')
-    
-        self.sock.send(self.start_code)
-        self.sock.send(bytes([2]))
-        self.sock.send(len_data)
-        self.sock.send(data_array)
-        self.sock.send(self.end_code)
+        if self.recv_task is None or self.recv_task.done():
+            sock.close()
+        
+        if self._callback_executor is not None:
+            self._callback_executor.shutdown(wait=False)
+            self._callback_executor = None
+        
+    def _create_socket(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if self.no_delay:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.send_buffer_size is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer_size)
+        if self.recv_buffer_size is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer_size)
+        
+        return sock
+        
+    def send_packet(self, packet):
+        frame = self._make_frame(packet)
+        if frame is None:
+            return
 
-        logging.debug("[sent]=> {}".format(packet.serialize()))
+        self.sock.sendall(frame)
+    
+    def send_packets(self, packets):
+        buffers = []
+        for packet in packets:
+            frame_parts = self._make_frame_parts(packet)
+            if frame_parts is not None:
+                buffers.extend(frame_parts)
+                
+        if not hasattr(self.sock, 'sendmsg'):
+            self.sock.sendall(b''.join(buffers))
+            return
+        
+        buffers = [memoryview(buffer) for buffer in buffers]
+        index = 0
+        while index < len(buffers):
+            sent = self.sock.sendmsg(buffers[index:index + _SENDMSG_MAX_BUFFERS])
+            while sent > 0:
+                if sent < len(buffers[index]):
+                    buffers[index] = buffers[index][sent:]
+                    break
+                
+                sent -= len(buffers[index])
+                index += 1
+    
+    async def send_packet_async(self, packet):
+        import asyncio
+        
+        frame = self._make_frame(packet)
+        if frame is None:
+            return
+        
+        await asyncio.get_running_loop().sock_sendall(self.sock, frame)
     
     def recv(self):
-        logging.info("start messaging_client: {}".format(self.source_id))
+        logger.info("start messaging_client: %s", self.source_id)
         
+        sock = self.sock
         while self.sock is not None:
             
             try:
-                message = self._recv_packet()
-            except:
+                message = self._recv_packet(sock)
+            except (ConnectionError, OSError) as error:
+                logger.info("connection of messaging_client %s closed: %s", self.source_id, error)
                 break
             
             if message is None:
                 continue
             
-            if message.message_type() == "confirm_connection":
+            try:
+                handled = self._handle_message(message)
+            except Exception:
+                logger.exception("cannot handle message of messaging_client %s", self.source_id)
+                continue
+            
+            if not handled:
+                break
+        
+        logger.info("stop messaging_client: %s", self.source_id)
+    
+    async def recv_async(self):
+        logger.info("start messaging_client: %s", self.source_id)
+        
+        sock = self.sock
+        while self.sock is not None:
+            
+            try:
+                message = await self._recv_packet_async(sock)
+            except (ConnectionError, OSError) as error:
+                logger.info("connection of messaging_client %s closed: %s", self.source_id, error)
+                break
+            
+            if message is None:
+                continue
+            
+            try:
+                handled = self._handle_message(message)
+            except Exception:
+                logger.exception("cannot handle message of messaging_client %s", self.source_id)
+                continue
+            
+            if not handled:
+                break
+        
+        if self.sock is not sock:
+            sock.close()
+        
+        logger.info("stop messaging_client: %s", self.source_id)
+    
+    def _handle_message(self, message):
+        if message.message_type() == "confirm_connection":
+            
+            confirm = message.get('confirm')
+            if not confirm:
+                logger.error("cannot parse confirm message from %s", message.source_id())
                 
-                confirm = message.get('confirm')
-                if not confirm:
-                    logging.error("cannot parse confirm message from {}".format(message.source_id()))
+                self._notify(self.conn_callback, message.source_id(), message.source_sub_id(), False)
                     
-                    if self.conn_callback is not None:
-                        self.conn_callback(message.source_id(), message.source_sub_id(), False)
-                        
-                    break
+                return False
 
-                self.source_id = message.target_id()
-                self.source_sub_id = message.target_sub_id()
-                logging.info("received connection message from {}: confirm [{}]".format(message.source_id(), confirm[0].value_string))
-                
-                if self.conn_callback is not None:
-                    self.conn_callback(message.source_id(), message.source_sub_id(), True)
-                        
-                continue
+            self.source_id = message.target_id()
+            self.source_sub_id = message.target_sub_id()
+            logger.info("received connection message from %s: confirm [%s]", message.source_id(), confirm[0].value_string)
             
-            if self.recv_callback is not None:
-                self.recv_callback(message)
+            self._notify(self.conn_callback, message.source_id(), message.source_sub_id(), True)
+                    
+            return True
         
-        logging.info("stop messaging_client: {}".format(self.source_id))
+        self._notify(self.recv_callback, message)
             
-    def _recv_packet(self):
-        x = 0
-        while (x < 4):
-            if self.start_code[0:1] != self.sock.recv(1):
-                x = 0
-                continue
-            x = x + 1
+        return True
+    
+    def _notify(self, callback, *args):
+        if callback is None:
+            return
+        
+        if self._callback_executor is None:
+            self._run_callback(callback, args)
+            return
+        
+        self._callback_executor.submit(self._run_callback, callback, args)
+    
+    def _run_callback(self, callback, args):
+        try:
+            callback(*args)
+        except Exception:
+            logger.exception("callback of messaging_client %s raised an exception", self.source_id)
             
-        type_code = self.sock.recv(1)
-        if type_code != bytes([2]):
-            return None
+    def _recv_packet(self, sock):
+        completed, message = self._extract_packet()
+        while not completed:
+            received = sock.recv_into(self._recv_chunk)
+            if not received:
+                raise ConnectionError("connection closed by peer")
+            
+            self._recv_buffer += self._recv_chunk[:received]
+            completed, message = self._extract_packet()
+            
+        return message
+    
+    async def _recv_packet_async(self, sock):
+        import asyncio
         
-        len_data = self.sock.recv(4)
-        received_data = self.sock.recv(int.from_bytes(len_data, "little"))
+        loop = asyncio.get_running_loop()
         
-        x = 0
-        while (x < 4):
-            if self.end_code[0:1] != self.sock.recv(1):
-                break
-            x = x + 1
+        completed, message = self._extract_packet()
+        while not completed:
+            received = await loop.sock_recv_into(sock, self._recv_chunk)
+            if not received:
+                raise ConnectionError("connection closed by peer")
+            
+            self._recv_buffer += self._recv_chunk[:received]
+            completed, message = self._extract_packet()
+            
+        return message
+    
+    def _extract_packet(self):
+        index = self._recv_buffer.find(self.start_code)
+        if index < 0:
+            del self._recv_buffer[:max(len(self._recv_buffer) - len(self.start_code) + 1, 0)]
+            return False, None
+        del self._recv_buffer[:index]
+        
+        header_size = len(self.start_code) + _FRAME_FIELDS_STRUCT.size
+        if len(self._recv_buffer) < header_size:
+            return False, None
+        
+        packet_mode, data_size = _FRAME_FIELDS_STRUCT.unpack_from(self._recv_buffer, len(self.start_code))
+        if packet_mode != _PACKET_MODE:
+            del self._recv_buffer[:1]
+            return True, None
+        
+        packet_size = header_size + data_size + len(self.end_code)
+        if len(self._recv_buffer) < packet_size:
+            return False, None
+        
+        if self._recv_buffer[header_size + data_size:packet_size] != self.end_code:
+            del self._recv_buffer[:packet_size]
+            return True, None
+        
+        view = memoryview(self._recv_buffer)
+        payload = view[header_size:header_size + data_size]
+        try:
+            if payload[:len(_BINARY_MAGIC)] == _BINARY_MAGIC:
+                received_data = bytes(payload)
+            else:
+                received_data = None
+                packet_string = str(payload, 'utf-8')
+        except UnicodeDecodeError as error:
+            logger.error("cannot decode packet of messaging_client %s: %s", self.source_id, error)
+            return True, None
+        finally:
+            payload.release()
+            view.release()
+            del self._recv_buffer[:packet_size]
+        
+        if received_data is not None:
+            message = container()
+            try:
+                message.parse_binary(received_data)
+            except (ValueError, struct.error) as error:
+                logger.error("cannot parse binary packet of messaging_client %s: %s", self.source_id, error)
+                return True, None
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[received]=> %s", message.serialize())
+            
+            return True, message
         
-        if (x < 4):
+        logger.debug("[received]=> %s", packet_string)
+
+        return True, container(packet_string)
+    
+    def _make_frame(self, packet):
+        frame_parts = self._make_frame_parts(packet)
+        if frame_parts is None:
             return None
         
-        packet_string = received_data.decode('utf-8')
-        logging.debug("[received]=> {}".format(packet_string))
+        return b''.join(frame_parts)
+    
+    def _make_frame_parts(self, packet):
+        if not packet.target_id:
+            logger.error("cannot send with null target id")
+            return None
+            
+        if packet.source_id() == '':
+            packet.set_source_id(self.source_id)
+            packet.set_source_sub_id(self.source_sub_id)
+                    
+        if packet.version() == BINARY_VERSION:
+            data_array = packet.serialize_binary()
+        else:
+            data_array = packet.serialize_bytes()
+        len_data = _UINT32_STRUCT.pack(len(data_array))
 
-        return container(packet_string)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[sent]=> %s", packet.serialize())
+        
+        return (self._frame_prefix, len_data, data_array, self.end_code)
     
-    def _send_connection(self, auto_echo, auto_echo_interval_seconds):
+    def _connection_packet(self, auto_echo, auto_echo_interval_seconds):
         connection_packet = container()
         connection_packet.create('server', '', self.source_id, self.source_sub_id, 
                                 'request_connection', 
@@ -360,6 +776,8 @@ class messaging_client:
                                 value('session_type', '2', '1'),
                                 value('bridge_mode', '1', 'false'),
                                 value('snipping_targets', 'e', '0') ])
-
-        self.send_packet(connection_packet)
-        
\ No newline at end of file
+        
+        return connection_packet
+    
+    def _send_connection(self, auto_echo, auto_echo_interval_seconds):
+        self.send_packet(self._connection_packet(auto_echo, auto_echo_interval_seconds))